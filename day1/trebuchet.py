@@ -1,4 +1,10 @@
+import mmap
+import os
 import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 
 
 def load_data_from_file(filepath: str) -> list[str]:
@@ -7,27 +13,189 @@ def load_data_from_file(filepath: str) -> list[str]:
         return data.strip().splitlines()
 
 
-def find_calibration_value(text: str) -> int:
-    def get_first_digit(text: str) -> str:
-        for ch in text:
-            if ch.isdigit():
-                return ch
+DIGITS = {str(digit): digit for digit in range(10)}
+
+DIGIT_WORDS = {'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5,
+               'six': 6, 'seven': 7, 'eight': 8, 'nine': 9}
+
+
+class DigitAutomaton:
+    def __init__(self, patterns: dict[str, int]) -> None:
+        self.transitions: list[dict[str, int]] = [{}]
+        # for every state: (value, length) of the longest and the shortest
+        # pattern that ends there, found through the failure links
+        self.longest: list[tuple[int, int] | None] = [None]
+        self.shortest: list[tuple[int, int] | None] = [None]
+
+        for pattern, value in patterns.items():
+            self.__insert(pattern, value)
+        self.__link()
+
+    def __insert(self, pattern: str, value: int) -> None:
+        state = 0
+        for ch in pattern:
+            if ch not in self.transitions[state]:
+                self.transitions.append({})
+                self.longest.append(None)
+                self.shortest.append(None)
+                self.transitions[state][ch] = len(self.transitions) - 1
+            state = self.transitions[state][ch]
+        self.longest[state] = self.shortest[state] = (value, len(pattern))
+
+    def __link(self) -> None:
+        alphabet = {ch for transitions in self.transitions for ch in transitions}
+        fail = [0] * len(self.transitions)
+        queue = deque(self.transitions[0].values())
+        while queue:
+            state = queue.popleft()
+            fallback = fail[state]
+            if self.longest[state] is None:
+                self.longest[state] = self.longest[fallback]
+            if self.shortest[fallback] is not None:
+                self.shortest[state] = self.shortest[fallback]
+            for ch in alphabet:
+                if ch in self.transitions[state]:
+                    child = self.transitions[state][ch]
+                    fail[child] = self.transitions[fallback].get(ch, 0)
+                    queue.append(child)
+                else:
+                    self.transitions[state][ch] = self.transitions[fallback].get(ch, 0)
+
+    def find_first_and_last(self, text: str) -> tuple[int, int]:
+        transitions, longest, shortest = self.transitions, self.longest, self.shortest
+        first: tuple[int, int] | None = None
+        last: tuple[int, int] | None = None
+        state = 0
+        for i, ch in enumerate(text):
+            state = transitions[state].get(ch, 0)
+            if shortest[state] is None:
+                continue
+            value, length = longest[state]
+            start = i - length + 1
+            if first is None or start < first[1]:
+                first = value, start
+            value, length = shortest[state]
+            start = i - length + 1
+            if last is None or start >= last[1]:
+                last = value, start
+        if first is None:
+            raise ValueError(f'string: "{text}" does not contain any digits')
+        return first[0], last[0]
+
+
+SPELLED_DIGIT_AUTOMATON = DigitAutomaton(DIGITS | DIGIT_WORDS)
+
+
+def find_calibration_value(text: str, spelled=False) -> int:
+    if spelled:
+        first, last = SPELLED_DIGIT_AUTOMATON.find_first_and_last(text)
+        return first * 10 + last
+
+    # plain digits need no automaton, scan in from both ends and stop at the first hit
+    for ch in text:
+        if ch in DIGITS:
+            break
+    else:
         raise ValueError(f'string: "{text}" does not contain any digits')
+    for last in reversed(text):
+        if last in DIGITS:
+            return DIGITS[ch] * 10 + DIGITS[last]
+
 
-    def get_last_digit(text: str) -> str:
-        return get_first_digit(text[::-1])
+def find_calibration_values(buffer: bytes) -> np.ndarray:
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    newlines = np.flatnonzero(data == ord('\n'))
+    starts = np.concatenate(([0], newlines + 1))
+    ends = np.concatenate((newlines, [len(data)]))
 
-    first, last = get_first_digit(text), get_last_digit(text)
-    return int(f'{first}{last}')
+    # lines holding only whitespace are skipped, same as the trailing ones dropped by `strip()`
+    printable = np.concatenate(([0], np.cumsum(data > ord(' '))))
+    nonblank = printable[ends] > printable[starts]
+    starts, ends = starts[nonblank], ends[nonblank]
+
+    digits = np.flatnonzero((data >= ord('0')) & (data <= ord('9')))
+    first = np.searchsorted(digits, starts, side='left')
+    last = np.searchsorted(digits, ends, side='left') - 1
+
+    missing = np.flatnonzero(first > last)
+    if missing.size:
+        line = bytes(data[starts[missing[0]]:ends[missing[0]]]).decode().strip()
+        raise ValueError(f'string: "{line}" does not contain any digits')
+
+    tens = data[digits[first]].astype(np.int64) - ord('0')
+    ones = data[digits[last]].astype(np.int64) - ord('0')
+    return tens * 10 + ones
+
+
+def split_into_chunks(buffer: mmap.mmap, chunks: int) -> list[tuple[int, int]]:
+    size = len(buffer)
+    step = max(1, size // chunks)
+    bounds = []
+    start = 0
+    while start < size:
+        newline = buffer.find(b'\n', min(start + step, size) - 1)
+        end = size if newline == -1 else newline + 1
+        bounds.append((start, end))
+        start = end
+    return bounds
+
+
+def sum_chunk(filepath: str, start: int, end: int, spelled=False, verbose=False) -> int:
+    total = 0
+    with open(filepath, mode='rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        position = start
+        while position < end:
+            newline = buffer.find(b'\n', position, end)
+            if newline == -1:
+                newline = end
+            line = buffer[position:newline].decode().strip()
+            position = newline + 1
+            if not line:
+                continue
+            value = find_calibration_value(line, spelled)
+            total += value
+            if verbose:
+                print(line, '->', value)
+    return total
+
+
+def sum_calibration_values_streaming(filepath: str, workers: int | None = None, spelled=False,
+                                     verbose=False) -> int:
+    if os.path.getsize(filepath) == 0:
+        return 0
+
+    workers = workers or os.cpu_count() or 1
+    with open(filepath, mode='rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        # a few chunks per worker keeps the pool busy when line lengths are uneven
+        bounds = split_into_chunks(buffer, workers * 4)
+
+    if workers == 1:
+        return sum(sum_chunk(filepath, start, end, spelled, verbose) for start, end in bounds)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(sum_chunk, filepath, start, end, spelled, verbose) for start, end in bounds]
+        return sum(future.result() for future in futures)
 
 
 if __name__ == '__main__':
     path = sys.argv[1]
-    data = load_data_from_file(path)
-    sum = 0
-    for line in data:
-        value = find_calibration_value(line)
-        sum += value
-        print(line, '->', value)
-
-    print("SUM OF ALL VALUES:", sum)
+    flags = sys.argv[2:]
+    spelled = '--spelled' in flags
+    if '--batch' in flags:
+        if spelled:
+            sys.exit("--batch only finds digits, use --stream for spelled-out values")
+        with open(path, mode='rb') as file:
+            values = find_calibration_values(file.read())
+        print("SUM OF ALL VALUES:", int(values.sum()))
+    elif '--stream' in flags:
+        total = sum_calibration_values_streaming(path, spelled=spelled, verbose='--verbose' in flags)
+        print("SUM OF ALL VALUES:", total)
+    else:
+        data = load_data_from_file(path)
+        sum = 0
+        for line in data:
+            value = find_calibration_value(line, spelled)
+            sum += value
+            print(line, '->', value)
+
+        print("SUM OF ALL VALUES:", sum)
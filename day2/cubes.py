@@ -1,4 +1,12 @@
+import json
+import os
+import re
 import sys
+import time
+from array import array
+from bisect import bisect_right
+
+import numpy as np
 
 
 RED = 'red'
@@ -9,6 +17,10 @@ GAME_SEP = ':'
 DRAW_SEP = ';'
 CUBE_SEP = ','
 
+COLORS = (RED, GREEN, BLUE)
+COLUMNS = {color: i for i, color in enumerate(COLORS)}
+CUBE_PATTERN = re.compile(r'(\d+)\s+(red|green|blue)')
+
 
 class Bag:
     def __init__(self, red: int, green: int, blue: int) -> None:
@@ -20,21 +32,38 @@ class Bag:
         return game[RED] <= self.red and game[GREEN] <= self.green and game[BLUE] <= self.blue
 
 
+def parse_game(line: str) -> dict[str, int]:
+    game = {RED: 0, GREEN: 0, BLUE: 0}
+    draws = line.split(GAME_SEP)[1].split(DRAW_SEP)
+    for draw in draws:
+        cubes = draw.split(CUBE_SEP)
+        for cube in cubes:
+            count, color = cube.strip().split()
+            count = int(count)
+            if game[color] < count:
+                game[color] = count
+    return game
+
+
 def load_games_from_file(filepath: str) -> list[dict[str, int]]:
     games = []
     with open(filepath, mode='r') as file:
         lines = file.read().strip().splitlines()
         for line in lines:
-            game = {RED: 0, GREEN: 0, BLUE: 0}
-            draws = line.split(GAME_SEP)[1].split(DRAW_SEP)
-            for draw in draws:
-                cubes = draw.split(CUBE_SEP)
-                for cube in cubes:
-                    count, color = cube.strip().split()
-                    count = int(count)
-                    if game[color] < count:
-                        game[color] = count
-            games.append(game)
+            games.append(parse_game(line))
+    return games
+
+
+def load_game_array_from_file(filepath: str) -> np.ndarray:
+    with open(filepath, mode='r') as file:
+        lines = file.read().strip().splitlines()
+        games = np.zeros((len(lines), len(COLORS)), dtype=np.int64)
+        for i, line in enumerate(lines):
+            row = [0] * len(COLORS)
+            for count, color in CUBE_PATTERN.findall(line.split(GAME_SEP)[1]):
+                column = COLUMNS[color]
+                row[column] = max(row[column], int(count))
+            games[i] = row
     return games
 
 
@@ -54,8 +83,209 @@ def get_powers(games: list[dict[str, int]]) -> list[int]:
     return powers
 
 
+def get_power_array(games: np.ndarray) -> np.ndarray:
+    return games.prod(axis=1)
+
+
+def evaluate_bags(games: np.ndarray, bags: np.ndarray, memory_budget=1 << 26) -> tuple[np.ndarray, np.ndarray]:
+    # bags are processed in blocks so the (bags x games x colors) mask stays within the budget (bytes)
+    block_size = max(1, memory_budget // (len(COLORS) * max(1, len(games))))
+    ids = np.arange(1, len(games) + 1, dtype=np.int64)
+    powers = get_power_array(games)
+    id_sums = np.zeros(len(bags), dtype=np.int64)
+    power_sums = np.zeros(len(bags), dtype=np.int64)
+    for start in range(0, len(bags), block_size):
+        block = bags[start:start + block_size]
+        possible = (games[np.newaxis, :, :] <= block[:, np.newaxis, :]).all(axis=2)
+        id_sums[start:start + block_size] = possible @ ids
+        power_sums[start:start + block_size] = possible @ powers
+    return id_sums, power_sums
+
+
+class DominanceIndex:
+    def __init__(self, games: list[dict[str, int]]) -> None:
+        self.points = sorted((game[RED], game[GREEN], game[BLUE], id) for id, game in enumerate(games, start=1))
+        self.reds = [red for red, _, _, _ in self.points]
+        self.green_ranks = sorted({green for _, green, _, _ in self.points})
+
+        # Fenwick tree over green ranks for the offline sweep, every node keeps the sorted
+        # blue values of the games that can ever be added to it
+        self.node_blues: list[list[int]] = [[] for _ in range(len(self.green_ranks) + 1)]
+        for _, green, blue, _ in self.points:
+            node = bisect_right(self.green_ranks, green)
+            while node < len(self.node_blues):
+                self.node_blues[node].append(blue)
+                node += node & -node
+        self.node_blues = [sorted(set(blues)) for blues in self.node_blues]
+
+        # the static tree for single queries is only built once `query_one` needs it
+        self.greens: array | None = None
+
+    def __build_static(self) -> None:
+        # static Fenwick tree over red ranks: outer node `j` covers the games at red ranks
+        # (j - lowbit(j), j], sorted by green, with an inner Fenwick tree over those green
+        # positions whose nodes hold sorted blues and running id sums; all flattened into arrays
+        self.greens = array('q')
+        self.green_offsets = [0] * (len(self.points) + 1)
+        self.inner_starts = array('q')
+        self.blues = array('q')
+        self.id_sums = array('q')
+        for outer in range(1, len(self.points) + 1):
+            covered = sorted(self.points[outer - (outer & -outer):outer], key=lambda p: p[1])
+            self.green_offsets[outer] = len(self.greens)
+            self.greens.extend(green for _, green, _, _ in covered)
+            for inner in range(1, len(covered) + 1):
+                segment = sorted((blue, id) for _, _, blue, id in covered[inner - (inner & -inner):inner])
+                self.inner_starts.append(len(self.blues))
+                total = 0
+                for blue, id in segment:
+                    total += id
+                    self.blues.append(blue)
+                    self.id_sums.append(total)
+
+    def query_one(self, bag: Bag) -> tuple[int, int]:
+        if self.greens is None:
+            self.__build_static()
+        count = id_sum = 0
+        outer = bisect_right(self.reds, bag.red)
+        while outer > 0:
+            size = outer & -outer
+            offset = self.green_offsets[outer]
+            inner = bisect_right(self.greens, bag.green, offset, offset + size) - offset
+            while inner > 0:
+                start = self.inner_starts[offset + inner - 1]
+                matched = bisect_right(self.blues, bag.blue, start, start + (inner & -inner)) - start
+                if matched:
+                    count += matched
+                    id_sum += self.id_sums[start + matched - 1]
+                inner -= inner & -inner
+            outer -= size
+        return count, id_sum
+
+    def query(self, bags: list[Bag]) -> list[tuple[int, int]]:
+        counts = [[0] * (len(blues) + 1) for blues in self.node_blues]
+        id_sums = [[0] * (len(blues) + 1) for blues in self.node_blues]
+
+        def insert(green: int, blue: int, id: int) -> None:
+            node = bisect_right(self.green_ranks, green)
+            while node < len(self.node_blues):
+                blues = self.node_blues[node]
+                inner = bisect_right(blues, blue)
+                while inner <= len(blues):
+                    counts[node][inner] += 1
+                    id_sums[node][inner] += id
+                    inner += inner & -inner
+                node += node & -node
+
+        def prefix(green: int, blue: int) -> tuple[int, int]:
+            count = id_sum = 0
+            node = bisect_right(self.green_ranks, green)
+            while node > 0:
+                inner = bisect_right(self.node_blues[node], blue)
+                while inner > 0:
+                    count += counts[node][inner]
+                    id_sum += id_sums[node][inner]
+                    inner -= inner & -inner
+                node -= node & -node
+            return count, id_sum
+
+        # offline sweep along red: games enter the tree once their red maximum fits the bag
+        results: list[tuple[int, int]] = [(0, 0)] * len(bags)
+        inserted = 0
+        for index in sorted(range(len(bags)), key=lambda i: bags[i].red):
+            bag = bags[index]
+            while inserted < len(self.points) and self.points[inserted][0] <= bag.red:
+                _, green, blue, id = self.points[inserted]
+                insert(green, blue, id)
+                inserted += 1
+            results[index] = prefix(bag.green, bag.blue)
+        return results
+
+    def count(self, bag: Bag) -> int:
+        return self.query_one(bag)[0]
+
+    def sum_of_ids(self, bag: Bag) -> int:
+        return self.query_one(bag)[1]
+
+
+class GameLogFollower:
+    def __init__(self, filepath: str, bag: Bag, state_path: str | None = None) -> None:
+        self.filepath = filepath
+        self.bag = bag
+        self.state_path = state_path or f'{filepath}.state.json'
+
+        self.offset = 0
+        self.games = 0
+        self.sum_of_possible = 0
+        self.sum_of_powers = 0
+
+        self.__load_state()
+
+    def __bag_key(self) -> list[int]:
+        return [self.bag.red, self.bag.green, self.bag.blue]
+
+    def __load_state(self) -> None:
+        if not os.path.exists(self.state_path):
+            return
+        with open(self.state_path, mode='rt') as file:
+            state = json.load(file)
+        # a state built for another bag or for a truncated log cannot be resumed
+        if state['bag'] != self.__bag_key() or state['offset'] > os.path.getsize(self.filepath):
+            return
+        self.offset = state['offset']
+        self.games = state['games']
+        self.sum_of_possible = state['sum_of_possible']
+        self.sum_of_powers = state['sum_of_powers']
+
+    def save_state(self) -> None:
+        state = {
+            'bag': self.__bag_key(),
+            'offset': self.offset,
+            'games': self.games,
+            'sum_of_possible': self.sum_of_possible,
+            'sum_of_powers': self.sum_of_powers,
+        }
+        tmp_path = f'{self.state_path}.tmp'
+        with open(tmp_path, mode='wt') as file:
+            json.dump(state, file)
+        os.replace(tmp_path, self.state_path)
+
+    def update(self, final=False) -> int:
+        with open(self.filepath, mode='rb') as file:
+            file.seek(self.offset)
+            data = file.read()
+
+        # a line without its newline may still be being written, unless told otherwise
+        end = len(data) if final else data.rfind(b'\n') + 1
+        added = 0
+        for line in data[:end].decode().splitlines():
+            if not line.strip():
+                continue
+            game = parse_game(line)
+            self.games += 1
+            added += 1
+            if self.bag.is_possible(game):
+                self.sum_of_possible += self.games
+            self.sum_of_powers += game[RED] * game[GREEN] * game[BLUE]
+        self.offset += end
+
+        if added:
+            self.save_state()
+        return added
+
+    def follow(self, interval=1.0) -> None:
+        while True:
+            if self.update():
+                print('games:', self.games, 'sum of possible ids:', self.sum_of_possible,
+                      'sum of powers:', self.sum_of_powers)
+            time.sleep(interval)
+
+
 if __name__ == '__main__':
     path = sys.argv[1]
+    if '--follow' in sys.argv[2:]:
+        GameLogFollower(path, Bag(red=12, green=13, blue=14)).follow()
+
     games = load_games_from_file(path)
     print(games)
  
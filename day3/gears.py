@@ -1,4 +1,11 @@
+import os
+import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Iterable, Iterator
+
+import numpy as np
 
 
 class Number:
@@ -181,8 +188,359 @@ class Schematic:
         return gears
 
 
+class EditableSchematic:
+    EMPTY = '.'
+
+    def __init__(self, width: int, height: int) -> None:
+        self.width = width
+        self.height = height
+        self.grid = [[EditableSchematic.EMPTY] * width for _ in range(height)]
+
+        # spatial index: every occupied cell points to the number or symbol covering it
+        self.numbers: dict[tuple[int, int], Number] = {}
+        self.symbols: dict[tuple[int, int], Symbol] = {}
+        self.spans: dict[Number, tuple[int, int, int]] = {}
+
+        self.serials_total = 0
+        self.gear_ratios_total = 0
+
+    @staticmethod
+    def from_lines(lines: list[str]) -> 'EditableSchematic':
+        lines = [line.strip() for line in lines]
+        width = max((len(line) for line in lines), default=0)
+        schematic = EditableSchematic(width, len(lines))
+        for row, line in enumerate(lines):
+            for col, ch in enumerate(line):
+                schematic.set_cell(row, col, ch)
+        return schematic
+
+    @staticmethod
+    def from_file(filepath: str) -> 'EditableSchematic':
+        with open(filepath, mode='rt') as file:
+            return EditableSchematic.from_lines(file.readlines())
+
+    def __str__(self) -> str:
+        return '\n'.join(''.join(line) for line in self.grid)
+
+    @property
+    def serials(self) -> list[int]:
+        numbers = sorted(self.spans.items(), key=lambda item: item[1])
+        return [n.value for n, _ in numbers if n.isserial]
+
+    @property
+    def gears(self) -> list[Symbol]:
+        symbols = sorted(self.symbols.items())
+        return [s for _, s in symbols if s.isgear]
+
+    def set_cell(self, row: int, col: int, value: str) -> None:
+        if not (0 <= row < self.height and 0 <= col < self.width):
+            raise IndexError(f'cell ({row}, {col}) is outside of {self.width}x{self.height} schematic')
+        if len(value) != 1:
+            raise ValueError(f'cell value must be a single character, got: "{value}"')
+        if self.grid[row][col] == value:
+            return
+
+        # numbers next to the cell may be merged or split by the edit
+        for c in (col - 1, col, col + 1):
+            if number := self.numbers.get((row, c)):
+                self.__remove_number(number)
+        if symbol := self.symbols.get((row, col)):
+            self.__remove_symbol(symbol)
+
+        self.grid[row][col] = value
+
+        if value.isdigit():
+            self.__add_number(row, col)
+        else:
+            for c in (col - 1, col + 1):
+                if 0 <= c < self.width and self.grid[row][c].isdigit():
+                    self.__add_number(row, c)
+            if value != EditableSchematic.EMPTY:
+                self.__add_symbol(row, col, value)
+
+    def clear_cell(self, row: int, col: int) -> None:
+        self.set_cell(row, col, EditableSchematic.EMPTY)
+
+    def __symbols_around(self, row: int, start: int, end: int) -> list[Symbol]:
+        symbols = []
+        for r in range(row - 1, row + 2):
+            for c in range(start - 1, end + 1):
+                if symbol := self.symbols.get((r, c)):
+                    symbols.append(symbol)
+        return symbols
+
+    def __numbers_around(self, row: int, col: int) -> set[Number]:
+        numbers = set()
+        for r in range(row - 1, row + 2):
+            for c in range(col - 1, col + 2):
+                if number := self.numbers.get((r, c)):
+                    numbers.add(number)
+        return numbers
+
+    def __update_serials(self, symbol: Symbol, number: Number, add: bool) -> None:
+        self.gear_ratios_total -= symbol.gear_ratio
+        if add:
+            symbol.add_serial(number)
+        else:
+            symbol.serials.discard(number)
+        self.gear_ratios_total += symbol.gear_ratio
+
+    def __mark_serial(self, number: Number, isserial: bool) -> None:
+        if number.isserial != isserial:
+            self.serials_total += number.value if isserial else -number.value
+            number.isserial = isserial
+
+    def __add_number(self, row: int, col: int) -> None:
+        start, end = col, col + 1
+        while start > 0 and self.grid[row][start - 1].isdigit():
+            start -= 1
+        while end < self.width and self.grid[row][end].isdigit():
+            end += 1
+
+        number = Number(int(''.join(self.grid[row][start:end])), (row, start))
+        self.spans[number] = row, start, end
+        for c in range(start, end):
+            self.numbers[(row, c)] = number
+
+        symbols = self.__symbols_around(row, start, end)
+        for symbol in symbols:
+            self.__update_serials(symbol, number, add=True)
+        self.__mark_serial(number, bool(symbols))
+
+    def __remove_number(self, number: Number) -> None:
+        row, start, end = self.spans.pop(number)
+        for c in range(start, end):
+            del self.numbers[(row, c)]
+
+        for symbol in self.__symbols_around(row, start, end):
+            self.__update_serials(symbol, number, add=False)
+        self.__mark_serial(number, False)
+
+    def __add_symbol(self, row: int, col: int, value: str) -> None:
+        symbol = Symbol(value, (row, col))
+        self.symbols[(row, col)] = symbol
+        for number in self.__numbers_around(row, col):
+            self.__update_serials(symbol, number, add=True)
+            self.__mark_serial(number, True)
+
+    def __remove_symbol(self, symbol: Symbol) -> None:
+        self.gear_ratios_total -= symbol.gear_ratio
+        del self.symbols[symbol.position]
+        for number in symbol.serials:
+            self.__mark_serial(number, bool(self.__symbols_around(*self.spans[number])))
+
+
+class SchematicGrid:
+    EMPTY = ord('.')
+    GEAR = ord('*')
+    MAX_INT64_DIGITS = 18
+
+    def __init__(self, grid: np.ndarray) -> None:
+        self.grid = grid
+        self.height, self.width = grid.shape
+
+        self.digits = (grid >= ord('0')) & (grid <= ord('9'))
+        self.symbols = ~self.digits & (grid != SchematicGrid.EMPTY)
+
+        self.labels, self.values = self.__label_numbers()
+
+    @staticmethod
+    def from_lines(lines: list[str]) -> 'SchematicGrid':
+        lines = [line.strip() for line in lines]
+        width = max((len(line) for line in lines), default=0)
+        grid = np.full((len(lines), width), SchematicGrid.EMPTY, dtype=np.uint8)
+        for i, line in enumerate(lines):
+            grid[i, :len(line)] = np.frombuffer(line.encode(), dtype=np.uint8)
+        return SchematicGrid(grid)
+
+    @staticmethod
+    def from_file(filepath: str) -> 'SchematicGrid':
+        with open(filepath, mode='rt') as file:
+            return SchematicGrid.from_lines(file.readlines())
+
+    def __label_numbers(self) -> tuple[np.ndarray, np.ndarray]:
+        # every digit cell gets the id (1-based, row-major) of the number span it belongs to
+        starts = self.digits.copy()
+        starts[:, 1:] &= ~self.digits[:, :-1]
+        labels = np.cumsum(starts.ravel()).reshape(self.grid.shape) * self.digits
+
+        flat_labels = labels.ravel()
+        cells = np.flatnonzero(flat_labels)
+        span_ids = flat_labels[cells]
+        ends = np.zeros(span_ids.max(initial=0) + 1, dtype=np.int64)
+        np.maximum.at(ends, span_ids, cells)
+
+        first_cells = np.full(len(ends), len(flat_labels), dtype=np.int64)
+        np.minimum.at(first_cells, span_ids, cells)
+        if (ends - first_cells).max(initial=0) >= SchematicGrid.MAX_INT64_DIGITS:
+            # too long for int64, fall back to python ints like `Schematic` does
+            flat = self.grid.ravel()
+            values = np.zeros(len(ends), dtype=object)
+            for span in range(1, len(ends)):
+                values[span] = int(bytes(flat[first_cells[span]:ends[span] + 1]))
+            return labels, values
+
+        digits = self.grid.ravel()[cells].astype(np.int64) - ord('0')
+        values = np.zeros(len(ends), dtype=np.int64)
+        np.add.at(values, span_ids, digits * 10 ** (ends[span_ids] - cells))
+        return labels, values
+
+    def __neighbourhood(self, mask: np.ndarray) -> np.ndarray:
+        padded = np.pad(mask, 1)
+        dilated = np.zeros_like(mask)
+        for dl in range(3):
+            for dc in range(3):
+                dilated |= padded[dl:dl + self.height, dc:dc + self.width]
+        return dilated
+
+    @property
+    def serial_labels(self) -> np.ndarray:
+        touched = self.__neighbourhood(self.symbols) & self.digits
+        return np.unique(self.labels[touched])
+
+    @property
+    def serials(self) -> list[int]:
+        return self.values[self.serial_labels].tolist()
+
+    @property
+    def gear_ratios(self) -> list[int]:
+        rows, cols = np.nonzero(self.grid == SchematicGrid.GEAR)
+        padded = np.pad(self.labels, 1)
+        around = np.stack([padded[rows + dl, cols + dc] for dl in range(3) for dc in range(3)], axis=1)
+
+        around.sort(axis=1)
+        distinct = (around[:, 1:] != around[:, :-1]) & (around[:, 1:] > 0)
+        gears = distinct.sum(axis=1) == 2
+
+        first = np.where(around > 0, around, np.iinfo(around.dtype).max).min(axis=1)
+        last = around.max(axis=1)
+        # ratios can exceed int64 even for int64 values, multiply as python ints
+        return [a * b for a, b in zip(self.values[first[gears]].tolist(), self.values[last[gears]].tolist())]
+
+
+NUMBER_PATTERN = re.compile(r'[0-9]+')
+
+
+@dataclass
+class RowResult:
+    row: int
+    serials: list[int]
+    gear_ratios: list[int]
+
+
+@dataclass
+class ParsedRow:
+    numbers: list[tuple[int, int, int]]
+    symbols: dict[int, str]
+
+    @staticmethod
+    def parse(line: str) -> 'ParsedRow':
+        line = line.strip()
+        numbers = [(m.start(), m.end(), int(m.group())) for m in NUMBER_PATTERN.finditer(line)]
+        symbols = {i: ch for i, ch in enumerate(line) if ch != '.' and not ch.isdigit()}
+        return ParsedRow(numbers, symbols)
+
+
+EMPTY_ROW = ParsedRow([], {})
+
+
+def evaluate_rows(lines: Iterable[str]) -> Iterator[RowResult]:
+    # a row is final once the row below it has been read, so only three rows are kept alive
+    def finalize(index: int, prev: ParsedRow, current: ParsedRow, next: ParsedRow) -> RowResult:
+        window = (prev, current, next)
+        serials = []
+        for start, end, value in current.numbers:
+            if any(c in row.symbols for row in window for c in range(start - 1, end + 1)):
+                serials.append(value)
+
+        gear_ratios = []
+        for c, symbol in current.symbols.items():
+            if symbol != '*':
+                continue
+            adjacent = [value for row in window for start, end, value in row.numbers if start - 1 <= c <= end]
+            if len(adjacent) == 2:
+                gear_ratios.append(adjacent[0] * adjacent[1])
+        return RowResult(index, serials, gear_ratios)
+
+    prev, current = EMPTY_ROW, None
+    index = -1
+    for line in lines:
+        next = ParsedRow.parse(line)
+        if current is not None:
+            yield finalize(index, prev, current, next)
+            prev = current
+        current = next
+        index += 1
+    if current is not None:
+        yield finalize(index, prev, current, EMPTY_ROW)
+
+
+def evaluate_stream(filepath: str) -> tuple[int, int]:
+    sum_of_serials = 0
+    sum_of_gear_ratios = 0
+    with open(filepath, mode='rt') as file:
+        for result in evaluate_rows(file):
+            sum_of_serials += sum(result.serials)
+            sum_of_gear_ratios += sum(result.gear_ratios)
+    return sum_of_serials, sum_of_gear_ratios
+
+
+def evaluate_band(lines: list[str], top_halo: bool, bottom_halo: bool) -> tuple[list[int], list[int]]:
+    first = 1 if top_halo else 0
+    last = len(lines) - 1 if bottom_halo else len(lines)
+    serials: list[int] = []
+    gear_ratios: list[int] = []
+    for result in evaluate_rows(lines):
+        # halo rows only provide context, they are owned by the neighbouring band
+        if first <= result.row < last:
+            serials.extend(result.serials)
+            gear_ratios.extend(result.gear_ratios)
+    return serials, gear_ratios
+
+
+def evaluate_parallel(filepath: str, workers: int | None = None) -> tuple[list[int], list[int]]:
+    with open(filepath, mode='rt') as file:
+        lines = file.readlines()
+    if not lines:
+        return [], []
+
+    workers = workers or os.cpu_count() or 1
+    band_height = max(1, -(-len(lines) // workers))
+    bands = []
+    for start in range(0, len(lines), band_height):
+        end = min(start + band_height, len(lines))
+        top_halo, bottom_halo = start > 0, end < len(lines)
+        bands.append((lines[start - top_halo:end + bottom_halo], top_halo, bottom_halo))
+
+    serials: list[int] = []
+    gear_ratios: list[int] = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for band_serials, band_gear_ratios in pool.map(evaluate_band, *zip(*bands)):
+            serials.extend(band_serials)
+            gear_ratios.extend(band_gear_ratios)
+    return serials, gear_ratios
+
+
 if __name__ == '__main__':
     path = sys.argv[1]
+    if '--grid' in sys.argv[2:]:
+        grid = SchematicGrid.from_file(path)
+        print('SUM OF SERIALS:', sum(grid.serials))
+        print('SUM OF GEAR POWERS:', sum(grid.gear_ratios))
+        sys.exit()
+
+    if '--parallel' in sys.argv[2:]:
+        serials, gear_ratios = evaluate_parallel(path)
+        print('SUM OF SERIALS:', sum(serials))
+        print('SUM OF GEAR POWERS:', sum(gear_ratios))
+        sys.exit()
+
+    if '--stream' in sys.argv[2:]:
+        sum_of_serials, sum_of_gear_ratios = evaluate_stream(path)
+        print('SUM OF SERIALS:', sum_of_serials)
+        print('SUM OF GEAR POWERS:', sum_of_gear_ratios)
+        sys.exit()
+
     schema = Schematic.from_file(path)
 
     # print(schema)
@@ -1,20 +1,34 @@
+import sys
+from collections import deque
+from typing import Iterable, Iterator
+
+import numpy as np
+
+
+def to_bitmask(numbers: list[int]) -> int:
+    mask = 0
+    for number in numbers:
+        mask |= 1 << number
+    return mask
+
+
 class Card:
-    def __init__(self, winning_numbers: list[str], scratched_numbers: list[str], id: int) -> None:
-        self.winning: set[str] = set(winning_numbers)
+    def __init__(self, winning_numbers: list[int], scratched_numbers: list[int], id: int) -> None:
+        self.winning = winning_numbers
         self.scratched = scratched_numbers
         self.id = id
 
+        self.winning_mask = to_bitmask(winning_numbers)
+        self.scratched_mask = to_bitmask(scratched_numbers)
+
         self.matches = self.__getmatches()
         self.score = self.__getscore()
 
-    def __getmatches(self) -> list[str]:
-        return self.winning.intersection(self.scratched)
+    def __getmatches(self) -> int:
+        return (self.winning_mask & self.scratched_mask).bit_count()
 
     def __getscore(self) -> int:
-        points = 1 if self.matches else 0
-        for _ in range(len(self.matches) - 1):
-            points *= 2
-        return points
+        return 1 << (self.matches - 1) if self.matches else 0
 
     def __str__(self) -> str:
         return f'Card {self.id}: (winning={self.winning} | scratched={self.scratched})'
@@ -23,42 +37,84 @@ class Card:
         return str(self)
 
     def evaluate(self) -> list[int]:
-        return [self.id + x + 1 for x, _ in enumerate(self.matches)]
+        return [self.id + x + 1 for x in range(self.matches)]
 
 
-def load_from_file(filepath: str) -> list[Card]:
-    def parse_line(line: str, id: int) -> Card:
-        _, numbers = line.split(':')
-        winning, scratched = numbers.split('|')
-        return Card([w for w in winning.strip().split()], [s for s in scratched.strip().split()], id)
+def parse_card(line: str, id: int) -> Card:
+    _, numbers = line.split(':')
+    winning, scratched = numbers.split('|')
+    return Card([int(w) for w in winning.split()], [int(s) for s in scratched.split()], id)
+
 
-    cards = []
+def iter_cards(filepath: str) -> Iterator[Card]:
     with open(filepath, mode='rt') as file:
-        lines = file.readlines()
-        for i, line in enumerate(lines):
-            card = parse_line(line, i+1)
-            cards.append(card)
+        for i, line in enumerate(file):
+            yield parse_card(line, i+1)
+
+
+def load_from_file(filepath: str) -> list[Card]:
+    return list(iter_cards(filepath))
+
 
-    return cards
+def to_word_arrays(cards: list[Card]) -> tuple[np.ndarray, np.ndarray]:
+    bits = max((max(c.winning_mask.bit_length(), c.scratched_mask.bit_length()) for c in cards), default=0)
+    words = max(1, -(-bits // 64))
+
+    def pack(masks: list[int]) -> np.ndarray:
+        buffer = b''.join(mask.to_bytes(words * 8, 'little') for mask in masks)
+        return np.frombuffer(buffer, dtype='<u8').reshape(len(masks), words)
+
+    return pack([c.winning_mask for c in cards]), pack([c.scratched_mask for c in cards])
+
+
+def score_cards(winning: np.ndarray, scratched: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    matches = np.bitwise_count(winning & scratched).sum(axis=1, dtype=np.int64)
+    if matches.max(initial=0) > 63:
+        # 2**63 and above no longer fit in int64, fall back to python ints
+        scores = np.array([1 << (m - 1) if m else 0 for m in matches.tolist()], dtype=object)
+        return matches, scores
+    scores = np.where(matches > 0, np.left_shift(1, np.maximum(matches - 1, 0)), 0)
+    return matches, scores
+
+
+def count_copies(cards: list[Card]) -> dict[int, int]:
+    # copies only ever flow to cards with higher ids, so one pass in id order settles every count
+    copies = {c.id: 1 for c in cards}
+    for card in sorted(cards, key=lambda c: c.id):
+        for copy in card.evaluate():
+            if copy in copies:
+                copies[copy] += copies[card.id]
+    return copies
 
 
 def process_cards(cards: list[Card]) -> int:
-    stack: list[Card] = cards[:]
-    deck = {c.id: c for c in cards}
-    cards_total = 0
+    return sum(count_copies(cards).values())
 
-    while stack:
-        card = stack.pop()
-        cards_total += 1
-        copies = card.evaluate()
-        for copy in copies:
-            if copy in deck:
-                stack.append(deck[copy])
-    return cards_total
+
+def process_stream(cards: Iterable[Card]) -> tuple[int, int]:
+    # pending[k] holds the copies won so far by the card k positions ahead
+    pending: deque[int] = deque()
+    score_total = 0
+    cards_total = 0
+    for card in cards:
+        copies = 1 + (pending.popleft() if pending else 0)
+        score_total += card.score
+        cards_total += copies
+        while len(pending) < card.matches:
+            pending.append(0)
+        for k in range(card.matches):
+            pending[k] += copies
+    return score_total, cards_total
 
 
 if __name__ == '__main__':
     path = 'input.txt'
+    if '--stream' in sys.argv[1:]:
+        score, total = process_stream(iter_cards(path))
+        print('TOTAL SCORE:', score)
+        print('TOTAL CARDS:', total)
+        sys.exit()
+
     cards = load_from_file(path)
     for card in cards:
         print(card, card.matches, card.score, card.evaluate())
@@ -1,3 +1,11 @@
+import sys
+from bisect import bisect_right
+
+import numpy as np
+
+from almanac_binary import CompiledAlmanac, load_compiled
+
+
 class FieldIndex:
     SEEDS = 0
     SOIL = 1
@@ -38,14 +46,34 @@ class Map:
         def check_implicit_ranges() -> int | None:
             for range in self.__implicit_ranges:
                 value = range.get(source)
-                if value:
+                if value is not None:
                     return value
             return None
 
-        if value := check_implicit_ranges():
+        if (value := check_implicit_ranges()) is not None:
             return value
         return source
 
+    def to_piecewise(self) -> 'PiecewiseMap':
+        bounds = {LOWEST}
+        for range in self.__implicit_ranges:
+            bounds.update((range.src_start, range.src_end + 1))
+
+        # ranges added first win where they overlap, same as in `get`
+        starts, offsets = [], []
+        for start in sorted(bounds):
+            offset = 0
+            for range in self.__implicit_ranges:
+                if range.in_range(start):
+                    offset = range.dest_start - range.src_start
+                    break
+            starts.append(start)
+            offsets.append(offset)
+        return PiecewiseMap(starts, offsets)
+
+    def get_many(self, sources: np.ndarray) -> np.ndarray:
+        return self.to_piecewise().get_many(sources)
+
     def __str__(self) -> str:
         return f'Map(implicit_mappings={self.__implicit_ranges})'
 
@@ -53,6 +81,72 @@ class Map:
         return str(self)
 
 
+LOWEST = -(1 << 63)
+
+
+class PiecewiseMap:
+    def __init__(self, starts: list[int], offsets: list[int]) -> None:
+        # piece `i` maps [starts[i], starts[i + 1]) by adding offsets[i], the last piece is unbounded
+        self.starts: list[int] = []
+        self.offsets: list[int] = []
+        for start, offset in zip(starts, offsets):
+            if self.offsets and self.offsets[-1] == offset:
+                continue
+            self.starts.append(start)
+            self.offsets.append(offset)
+
+    def __str__(self) -> str:
+        return f'PiecewiseMap(pieces={list(zip(self.starts, self.offsets))})'
+
+    def __repr__(self) -> str:
+        return str(self)
+
+    def end(self, index: int) -> int | None:
+        return self.starts[index + 1] if index + 1 < len(self.starts) else None
+
+    def get(self, source: int) -> int:
+        return source + self.offsets[bisect_right(self.starts, source) - 1]
+
+    def get_many(self, sources: np.ndarray) -> np.ndarray:
+        starts = np.array(self.starts, dtype=np.int64)
+        offsets = np.array(self.offsets, dtype=np.int64)
+        return sources + offsets[np.searchsorted(starts, sources, side='right') - 1]
+
+    def get_from_range(self, start: int, length: int) -> list[tuple[int, int]]:
+        results = []
+        stop = start + length
+        index = bisect_right(self.starts, start) - 1
+        while start < stop:
+            end = self.end(index)
+            piece_stop = stop if end is None else min(stop, end)
+            results.append((start + self.offsets[index], piece_stop - start))
+            start = piece_stop
+            index += 1
+        return results
+
+    def then(self, other: 'PiecewiseMap') -> 'PiecewiseMap':
+        starts, offsets = [], []
+        for index, (start, offset) in enumerate(zip(self.starts, self.offsets)):
+            end = self.end(index)
+            # walk the pieces of `other` that the image of this piece falls into
+            other_index = bisect_right(other.starts, start + offset) - 1
+            while True:
+                starts.append(max(start, other.starts[other_index] - offset))
+                offsets.append(offset + other.offsets[other_index])
+                other_end = other.end(other_index)
+                if other_end is None or (end is not None and other_end >= end + offset):
+                    break
+                other_index += 1
+        return PiecewiseMap(starts, offsets)
+
+
+def compose_maps(maps: dict[int, Map]) -> PiecewiseMap:
+    composed = maps[FieldIndex.SOIL].to_piecewise()
+    for index in range(FieldIndex.FERTILIZER, FieldIndex.LOCATION + 1):
+        composed = composed.then(maps[index].to_piecewise())
+    return composed
+
+
 def load_data(filepath: str) -> tuple[list[int], dict[int, Map]]:
     def parse_map_field(field: str) -> Map:
         lines = field.strip().split('\n')[1:]
@@ -75,6 +169,30 @@ def load_data(filepath: str) -> tuple[list[int], dict[int, Map]]:
         return seeds, maps
 
 
+def build_maps(ranges: dict[int, list[tuple[int, int, int]]]) -> dict[int, Map]:
+    maps = {}
+    for index, map_ranges in ranges.items():
+        map = Map()
+        for dest, src, range_len in map_ranges:
+            map.add(int(dest), int(src), int(range_len))
+        maps[index] = map
+    return maps
+
+
+def compose_ranges(ranges: dict[int, list[tuple[int, int, int]]]) -> tuple[list[int], list[int]]:
+    composed = compose_maps(build_maps(ranges))
+    return composed.starts, composed.offsets
+
+
+def load_compiled_data(filepath: str) -> CompiledAlmanac:
+    return load_compiled(filepath, compose=compose_ranges)
+
+
+def load_data_compiled(filepath: str) -> tuple[list[int], dict[int, Map]]:
+    compiled = load_compiled_data(filepath)
+    return compiled.seeds.tolist(), build_maps(compiled.maps)
+
+
 def find_location(maps: dict[int, Map], seed: int) -> int:
     seed_to_soil = maps[FieldIndex.SOIL].get(seed)
     soil_to_fertilizer = maps[FieldIndex.FERTILIZER].get(seed_to_soil)
@@ -86,7 +204,18 @@ def find_location(maps: dict[int, Map], seed: int) -> int:
     return humidity_to_location
 
 
+def find_locations(maps: dict[int, Map], seeds: np.ndarray) -> np.ndarray:
+    values = np.asarray(seeds, dtype=np.int64)
+    for index in range(FieldIndex.SOIL, FieldIndex.LOCATION + 1):
+        values = maps[index].get_many(values)
+    return values
+
+
 if __name__ == '__main__':
+    if '--compiled' in sys.argv[1:]:
+        compiled = load_compiled_data('input.txt')
+        print('PART 1 --- LOWEST LOCATION (compiled):', compiled.find_locations(compiled.seeds).min())
+        sys.exit()
 
     ###### PART 1 ######################################
     seeds, maps = load_data('input.txt')
@@ -95,3 +224,6 @@ if __name__ == '__main__':
     lowest_location = min(locations)
 
     print('PART 1 --- LOWEST LOCATION:', lowest_location)
+
+    composed = compose_maps(maps)
+    print('PART 1 --- LOWEST LOCATION (composed):', min(composed.get(seed) for seed in seeds))
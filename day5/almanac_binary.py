@@ -0,0 +1,122 @@
+import hashlib
+import mmap
+import os
+import struct
+from typing import Callable
+
+import numpy as np
+
+
+MAGIC = b'ALMANAC\x00'
+VERSION = 2
+MAPS = 7
+
+# magic, version, has composed chain, source sha256, seed count, composed piece count, range count per map
+HEADER = struct.Struct(f'<8sII32sQQ{MAPS}Q')
+
+# columns of every map array, rows keep the order of the source file
+DEST, SRC, LENGTH = 0, 1, 2
+
+
+def parse_almanac(text: str) -> tuple[list[int], dict[int, list[tuple[int, int, int]]]]:
+    fields = text.strip().split('\n\n')
+    seeds = [int(s) for s in fields[0].strip().split(':')[1].split()]
+    maps = {}
+    for index in range(1, MAPS + 1):
+        lines = fields[index].strip().split('\n')[1:]
+        maps[index] = [tuple(int(n) for n in line.split()) for line in lines]
+    return seeds, maps
+
+
+def source_checksum(filepath: str) -> bytes:
+    digest = hashlib.sha256()
+    with open(filepath, mode='rb') as file:
+        while chunk := file.read(1 << 20):
+            digest.update(chunk)
+    return digest.digest()
+
+
+class CompiledAlmanac:
+    def __init__(self, buffer: mmap.mmap) -> None:
+        # arrays are views into the mapping, keep it referenced for as long as they live
+        self.buffer = buffer
+        magic, self.version, has_composed, self.checksum, seed_count, composed_count, *counts = \
+            HEADER.unpack_from(buffer)
+        if magic != MAGIC:
+            raise ValueError('not a compiled almanac file')
+
+        offset = HEADER.size
+
+        def take(count: int, columns=1) -> np.ndarray:
+            nonlocal offset
+            array = np.frombuffer(buffer, dtype='<i8', count=count * columns, offset=offset)
+            offset += array.nbytes
+            return array.reshape(count, columns) if columns > 1 else array
+
+        self.seeds = take(seed_count)
+        self.maps = {index: take(count, 3) for index, count in enumerate(counts, start=1)}
+        self.composed: tuple[np.ndarray, np.ndarray] | None = None
+        if has_composed:
+            self.composed = take(composed_count), take(composed_count)
+
+    def close(self) -> None:
+        # views must be released before the mapping can be closed
+        self.seeds = self.maps = self.composed = None
+        self.buffer.close()
+
+    def find_locations(self, seeds: np.ndarray) -> np.ndarray:
+        if self.composed is None:
+            raise ValueError('almanac was compiled without the composed chain')
+        starts, offsets = self.composed
+        return seeds + offsets[np.searchsorted(starts, seeds, side='right') - 1]
+
+
+ComposeFunction = Callable[[dict[int, list[tuple[int, int, int]]]], tuple[list[int], list[int]]]
+
+
+def compile_almanac(source_path: str, artifact_path: str, compose: ComposeFunction | None = None) -> None:
+    with open(source_path, mode='rt') as file:
+        seeds, maps = parse_almanac(file.read())
+
+    starts, offsets = compose(maps) if compose else ([], [])
+    arrays = [np.array(seeds, dtype='<i8')]
+    for index in range(1, MAPS + 1):
+        # file order is kept: `Map.get` lets the first listed range win where ranges overlap
+        ranges = maps[index]
+        arrays.append(np.array(ranges, dtype='<i8').reshape(len(ranges), 3))
+    arrays.append(np.array(starts, dtype='<i8'))
+    arrays.append(np.array(offsets, dtype='<i8'))
+
+    header = HEADER.pack(MAGIC, VERSION, compose is not None, source_checksum(source_path),
+                         len(seeds), len(starts), *(len(maps[index]) for index in range(1, MAPS + 1)))
+
+    tmp_path = f'{artifact_path}.tmp'
+    with open(tmp_path, mode='wb') as file:
+        file.write(header)
+        for array in arrays:
+            file.write(array.tobytes())
+    os.replace(tmp_path, artifact_path)
+
+
+def open_compiled(artifact_path: str) -> CompiledAlmanac:
+    with open(artifact_path, mode='rb') as file:
+        return CompiledAlmanac(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+def load_compiled(source_path: str, artifact_path: str | None = None,
+                  compose: ComposeFunction | None = None) -> CompiledAlmanac:
+    artifact_path = artifact_path or f'{source_path}.almanac.bin'
+    if os.path.exists(artifact_path):
+        try:
+            compiled = open_compiled(artifact_path)
+        except (ValueError, struct.error):
+            compiled = None
+        # a stale artifact (other source, older format or missing chain) is rebuilt
+        if compiled and compiled.version == VERSION and compiled.checksum == source_checksum(source_path) \
+                and (compose is None or compiled.composed is not None):
+            return compiled
+        if compiled:
+            compiled.close()
+
+    compile_almanac(source_path, artifact_path, compose)
+    return open_compiled(artifact_path)
@@ -1,3 +1,11 @@
+import sys
+from bisect import bisect_right
+
+import numpy as np
+
+from almanac_binary import DEST, LENGTH, SRC, load_compiled
+
+
 class FieldIndex:
     SEEDS = 0
     SOIL = 1
@@ -9,6 +17,9 @@ class FieldIndex:
     LOCATION = 7
 
 
+HIGHEST = (1 << 63) - 1
+
+
 class Range:
     def __init__(self, start: int, length: int) -> None:
         self.start = start
@@ -81,6 +92,35 @@ class MappingRange:
         return ranges_outside, mapped_range
 
 
+class IntervalSet:
+    def __init__(self, starts: list[int], ends: list[int]) -> None:
+        # parallel lists of sorted, disjoint and non-adjacent inclusive intervals
+        self.starts: list[int] = []
+        self.ends: list[int] = []
+        for start, end in sorted(zip(starts, ends)):
+            if self.ends and start <= self.ends[-1] + 1:
+                self.ends[-1] = max(self.ends[-1], end)
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+    @staticmethod
+    def from_ranges(ranges: list[Range]) -> 'IntervalSet':
+        return IntervalSet([r.start for r in ranges], [r.end for r in ranges])
+
+    def to_ranges(self) -> list[Range]:
+        return [Range.from_startend(start, end) for start, end in zip(self.starts, self.ends)]
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __str__(self) -> str:
+        return f'IntervalSet(intervals={list(zip(self.starts, self.ends))})'
+
+    def __repr__(self) -> str:
+        return str(self)
+
+
 class Map:
     def __init__(self) -> None:
         self.__implicit_ranges: list[MappingRange] = []
@@ -93,14 +133,100 @@ class Map:
         def check_implicit_ranges() -> int | None:
             for range in self.__implicit_ranges:
                 value = range.get(source)
-                if value:
+                if value is not None:
                     return value
             return None
 
-        if value := check_implicit_ranges():
+        if (value := check_implicit_ranges()) is not None:
             return value
         return source
 
+    def __pieces(self) -> list[tuple[int, int, int]]:
+        # disjoint (start, end, offset) source pieces; the range added first wins where ranges
+        # overlap, same as in `get`
+        bounds = sorted({bound for range in self.__implicit_ranges
+                         for bound in (range.src_range.start, range.src_range.end + 1)})
+        pieces: list[tuple[int, int, int]] = []
+        for start, next_start in zip(bounds, bounds[1:]):
+            for range in self.__implicit_ranges:
+                if range.in_range(start):
+                    offset = range.dest_start - range.src_range.start
+                    if pieces and pieces[-1][1] == start - 1 and pieces[-1][2] == offset:
+                        pieces[-1] = (pieces[-1][0], next_start - 1, offset)
+                    else:
+                        pieces.append((start, next_start - 1, offset))
+                    break
+        return pieces
+
+    def get_many(self, sources: np.ndarray) -> np.ndarray:
+        pieces = self.__pieces()
+        if not pieces:
+            return sources.copy()
+        starts, ends, offsets = (np.array(column, dtype=np.int64) for column in zip(*pieces))
+
+        index = np.searchsorted(starts, sources, side='right') - 1
+        candidate = np.maximum(index, 0)
+        mapped = (index >= 0) & (sources <= ends[candidate])
+        return sources + np.where(mapped, offsets[candidate], 0)
+
+    def get_from_intervals(self, intervals: IntervalSet) -> IntervalSet:
+        pieces = self.__pieces()
+        starts: list[int] = []
+        ends: list[int] = []
+
+        # both sides are sorted, so a single sweep visits every boundary once
+        first = 0
+        for start, end in zip(intervals.starts, intervals.ends):
+            while first < len(pieces) and pieces[first][1] < start:
+                first += 1
+            position = start
+            index = first
+            while position <= end and index < len(pieces) and pieces[index][0] <= end:
+                piece_start, piece_end, offset = pieces[index]
+                if position < piece_start:
+                    starts.append(position)
+                    ends.append(piece_start - 1)
+                    position = piece_start
+                piece_end = min(end, piece_end)
+                if position <= piece_end:
+                    starts.append(position + offset)
+                    ends.append(piece_end + offset)
+                    position = piece_end + 1
+                index += 1
+            if position <= end:
+                starts.append(position)
+                ends.append(end)
+
+        return IntervalSet(starts, ends)
+
+    def inverse_pieces(self) -> list[tuple[int, int, int]]:
+        # (start, end, offset) in destination space, adding `offset` leads back to the source;
+        # unmapped gaps keep the identity, and pieces may overlap when two sources share a destination
+        pieces = []
+        position = 0
+        for start, end, offset in self.__pieces():
+            if position < start:
+                pieces.append((position, start - 1, 0))
+            pieces.append((start + offset, end + offset, -offset))
+            position = end + 1
+        if position <= HIGHEST:
+            pieces.append((position, HIGHEST, 0))
+        return sorted(pieces)
+
+    def preimage(self, intervals: IntervalSet) -> IntervalSet:
+        starts: list[int] = []
+        ends: list[int] = []
+        for piece_start, piece_end, offset in self.inverse_pieces():
+            index = max(bisect_right(intervals.starts, piece_start) - 1, 0)
+            while index < len(intervals) and intervals.starts[index] <= piece_end:
+                start = max(piece_start, intervals.starts[index])
+                end = min(piece_end, intervals.ends[index])
+                if start <= end:
+                    starts.append(start + offset)
+                    ends.append(end + offset)
+                index += 1
+        return IntervalSet(starts, ends)
+
     def get_from_range(self, source_range: Range) -> list[Range]:
         results: list[Range] = []
 
@@ -157,6 +283,21 @@ def load_data(filepath: str, ) -> tuple[list[Range], dict[int, Map]]:
         return seed_ranges, maps
 
 
+def load_data_compiled(filepath: str) -> tuple[list[Range], dict[int, Map]]:
+    compiled = load_compiled(filepath)
+    seeds = compiled.seeds.tolist()
+    seed_ranges = [Range(start, length) for start, length in zip(seeds[::2], seeds[1::2])]
+
+    maps = {}
+    for index, ranges in compiled.maps.items():
+        map = Map()
+        for dest, src, range_len in zip(ranges[:, DEST].tolist(), ranges[:, SRC].tolist(), ranges[:, LENGTH].tolist()):
+            map.add(dest, src, range_len)
+        maps[index] = map
+
+    return seed_ranges, maps
+
+
 def find_location(maps: dict[int, Map], seed: int) -> int:
     seed_to_soil = maps[FieldIndex.SOIL].get(seed)
     soil_to_fertilizer = maps[FieldIndex.FERTILIZER].get(seed_to_soil)
@@ -168,6 +309,13 @@ def find_location(maps: dict[int, Map], seed: int) -> int:
     return humidity_to_location
 
 
+def find_locations(maps: dict[int, Map], seeds: np.ndarray) -> np.ndarray:
+    values = np.asarray(seeds, dtype=np.int64)
+    for index in range(FieldIndex.SOIL, FieldIndex.LOCATION + 1):
+        values = maps[index].get_many(values)
+    return values
+
+
 def process_ranges(ranges: list[Range], map: Map) -> list[Range]:
     results = []
     for range in ranges:
@@ -177,23 +325,60 @@ def process_ranges(ranges: list[Range], map: Map) -> list[Range]:
 
 
 def find_location_from_ranges(maps: dict[int, Map], seeds: list[Range]) -> list[Range]:
-    seed_to_soil = process_ranges(seeds, maps[FieldIndex.SOIL])
-    soil_to_fertilizer = process_ranges(
-        seed_to_soil, maps[FieldIndex.FERTILIZER])
-    fertilizer_to_water = process_ranges(
-        soil_to_fertilizer, maps[FieldIndex.WATER])
-    water_to_light = process_ranges(
-        fertilizer_to_water, maps[FieldIndex.LIGHT])
-    light_to_temp = process_ranges(
-        water_to_light, maps[FieldIndex.TEMPERATURE])
-    temp_to_humidity = process_ranges(light_to_temp, maps[FieldIndex.HUMIDITY])
-    humidity_to_location = process_ranges(
-        temp_to_humidity, maps[FieldIndex.LOCATION])
-    return humidity_to_location
+    intervals = IntervalSet.from_ranges(seeds)
+    for index in range(FieldIndex.SOIL, FieldIndex.LOCATION + 1):
+        intervals = maps[index].get_from_intervals(intervals)
+    return intervals.to_ranges()
+
+
+def find_lowest_location(maps: dict[int, Map], seeds: list[Range]) -> int | None:
+    seed_intervals = IntervalSet.from_ranges(seeds)
+    pieces = {index: maps[index].inverse_pieces() for index in range(FieldIndex.SOIL, FieldIndex.LOCATION + 1)}
+
+    def search(stage: int, start: int, end: int) -> int | None:
+        if stage == FieldIndex.SEEDS:
+            index = max(bisect_right(seed_intervals.starts, start) - 1, 0)
+            while index < len(seed_intervals) and seed_intervals.starts[index] <= end:
+                if seed_intervals.ends[index] >= start:
+                    return max(start, seed_intervals.starts[index])
+                index += 1
+            return None
+
+        # pieces come in ascending order, so once one reaches the seeds only earlier values can beat it
+        best = None
+        for piece_start, piece_end, offset in pieces[stage]:
+            bound = end if best is None else min(end, best - 1)
+            if piece_start > bound:
+                break
+            low, high = max(start, piece_start), min(bound, piece_end)
+            if low > high:
+                continue
+            if (found := search(stage - 1, low + offset, high + offset)) is not None:
+                best = found - offset
+        return best
+
+    return search(FieldIndex.LOCATION, 0, HIGHEST)
+
+
+def find_seeds_up_to_location(maps: dict[int, Map], seeds: list[Range], location: int) -> list[Range]:
+    intervals = IntervalSet([0], [location])
+    for index in range(FieldIndex.LOCATION, FieldIndex.SEEDS, -1):
+        intervals = maps[index].preimage(intervals)
+
+    seed_intervals = IntervalSet.from_ranges(seeds)
+    results = []
+    for seed_range in seed_intervals.to_ranges():
+        for candidate in intervals.to_ranges():
+            if overlap := seed_range.intersect(candidate):
+                results.append(overlap)
+    return results
 
 
 if __name__ == '__main__':
-    seeds, maps = load_data('input.txt')
+    if '--compiled' in sys.argv[1:]:
+        seeds, maps = load_data_compiled('input.txt')
+    else:
+        seeds, maps = load_data('input.txt')
 
     locations = find_location_from_ranges(maps, seeds)
 
@@ -201,3 +386,4 @@ if __name__ == '__main__':
 
     print(locations)
     print("SMALLEST LOCATION:", min_location.start)
+    print("SMALLEST LOCATION (reverse search):", find_lowest_location(maps, seeds))
@@ -1,4 +1,10 @@
-from math import sqrt, ceil
+from math import isqrt, prod
+
+import numpy as np
+
+
+# largest time for which time**2 still fits into int64
+MAX_BATCH_TIME = isqrt(np.iinfo(np.int64).max)
 
 
 class Race:
@@ -14,22 +20,44 @@ class Race:
         # time = T
         # distance = -x^2 + xT
 
+        # the parabola peaks at T/2, if even that does not beat the record nothing will
+        if self.distance(self.time // 2) <= self.record_distance:
+            return 0
+
         delta = self.time**2 - 4 * self.record_distance
+        x1 = max(0, (self.time - isqrt(delta)) // 2)
+
+        # isqrt rounds down, so the estimate is at most a step away from the first winning time
+        while self.distance(x1) <= self.record_distance:
+            x1 += 1
+        while x1 > 0 and self.distance(x1 - 1) > self.record_distance:
+            x1 -= 1
+
+        # winning times are symmetric around T/2: [x1, T - x1]
+        return self.time - 2 * x1 + 1
+
 
-        if delta > 0:
-            x1 = ceil((self.time - sqrt(delta)) / 2)
-            x2 = int((self.time + sqrt(delta)) / 2)
+def possible_ways_batch(times: np.ndarray, records: np.ndarray) -> np.ndarray:
+    times = np.asarray(times, dtype=np.int64)
+    records = np.asarray(records, dtype=np.int64)
+    if times.size and (times.min() < 0 or times.max() > MAX_BATCH_TIME):
+        raise ValueError(f'batch times must be within [0, {MAX_BATCH_TIME}], use Race.possible_ways instead')
 
-            ways = int(x2 - x1)
+    def distance(holding: np.ndarray) -> np.ndarray:
+        return holding * (times - holding)
 
-            if self.distance(x1) > self.record_distance:
-                ways += 1
+    delta = np.maximum(times * times - 4 * records, 0)
+    root = np.floor(np.sqrt(delta.astype(np.float64))).astype(np.int64)
+    # float sqrt can be off by one for large values, settle on the exact integer root
+    root = np.where(root * root > delta, root - 1, root)
+    root = np.where((root + 1) * (root + 1) <= delta, root + 1, root)
 
-            if self.distance(x2) <= self.record_distance:
-                ways -= 1
+    x1 = np.maximum(0, (times - root) // 2)
+    x1 = np.where(distance(x1) <= records, x1 + 1, x1)
+    x1 = np.where((x1 > 0) & (distance(x1 - 1) > records), x1 - 1, x1)
 
-            return ways
-        return 0
+    winning = distance(times // 2) > records
+    return np.where(winning, times - 2 * x1 + 1, 0)
 
 
 def load_races_from_file(filepath: str) -> list[Race]:
@@ -54,6 +82,18 @@ def load_one_long_race(filepath: str) -> Race:
         return Race(int(time), int(distance))
 
 
+def load_race_arrays_from_file(filepath: str) -> tuple[np.ndarray, np.ndarray]:
+    with open(filepath, mode='rt') as file:
+        time_line, distance_line = file.read().strip().splitlines()
+        times = np.array(time_line.split()[1:], dtype=np.int64)
+        records = np.array(distance_line.split()[1:], dtype=np.int64)
+        return times, records
+
+
+def number_of_ways_batch(times: np.ndarray, records: np.ndarray) -> int:
+    return prod(possible_ways_batch(times, records).tolist())
+
+
 def number_of_ways(races: list[Race]) -> int:
     ways = races[0].possible_ways()
     for race in races[1:]:
@@ -66,6 +106,7 @@ if __name__ == '__main__':
 
     races = load_races_from_file(filepath)
     print(number_of_ways(races))
+    print(number_of_ways_batch(*load_race_arrays_from_file(filepath)))
 
     longrace = load_one_long_race(filepath)
     print(longrace.possible_ways())
@@ -0,0 +1,73 @@
+import random
+
+import numpy as np
+import pytest
+
+from racing import MAX_BATCH_TIME, Race, possible_ways_batch
+
+
+def brute_force_ways(time: int, record_distance: int) -> int:
+    race = Race(time, record_distance)
+    return sum(1 for holding_time in range(time + 1) if race.distance(holding_time) > record_distance)
+
+
+def first_winning_time(race: Race) -> int:
+    # binary search over [0, T/2] where distance() is increasing
+    low, high = 0, race.time // 2
+    while low < high:
+        middle = (low + high) // 2
+        if race.distance(middle) > race.record_distance:
+            high = middle
+        else:
+            low = middle + 1
+    return low
+
+
+def small_grid() -> list[tuple[int, int]]:
+    pairs = []
+    for time in range(0, 41):
+        peak = time * time // 4
+        records = set(range(-3, 6)) | {peak - 1, peak, peak + 1} | set(range(0, peak + 2, max(1, peak // 7)))
+        pairs.extend((time, record) for record in sorted(records))
+    return pairs
+
+
+@pytest.mark.parametrize('time, record_distance', small_grid())
+def test_possible_ways_matches_brute_force(time, record_distance):
+    assert Race(time, record_distance).possible_ways() == brute_force_ways(time, record_distance)
+
+
+def test_possible_ways_batch_matches_brute_force():
+    times, records = zip(*small_grid())
+    expected = [brute_force_ways(t, r) for t, r in zip(times, records)]
+    assert possible_ways_batch(np.array(times), np.array(records)).tolist() == expected
+
+
+def test_possible_ways_batch_near_max_batch_time():
+    rng = random.Random(6)
+    times, records = [], []
+    for time in (MAX_BATCH_TIME, MAX_BATCH_TIME - 1, MAX_BATCH_TIME - 2):
+        peak = time * time // 4
+        for record in (0, peak - 1, peak, peak + 1, rng.randint(0, peak)):
+            times.append(time)
+            records.append(record)
+
+    batch = possible_ways_batch(np.array(times, dtype=np.int64), np.array(records, dtype=np.int64))
+    assert batch.tolist() == [Race(t, r).possible_ways() for t, r in zip(times, records)]
+
+
+def test_possible_ways_batch_rejects_times_above_max():
+    with pytest.raises(ValueError):
+        possible_ways_batch(np.array([MAX_BATCH_TIME + 1]), np.array([0]))
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_possible_ways_big_integers(seed):
+    rng = random.Random(seed)
+    time = rng.randint(2**60, 2**200)
+    holding_time = rng.randint(0, time // 2)
+    race = Race(time, holding_time * (time - holding_time) - rng.randint(0, 1))
+
+    first = first_winning_time(race)
+    expected = time - 2 * first + 1 if race.distance(first) > race.record_distance else 0
+    assert race.possible_ways() == expected
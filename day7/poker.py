@@ -1,3 +1,12 @@
+import hashlib
+import heapq
+import os
+import tempfile
+from typing import Iterator
+
+import numpy as np
+
+
 class Card:
     TWO = '2'
     THREE = '3'
@@ -15,13 +24,41 @@ class Card:
 
 
 class TypeStrength:
-    FIVE_OF_KIND = 7E10
-    FOUR_OF_KIND = 6E10
-    FULL_HOUSE = 5E10
-    THREE_OF_KIND = 4E10
-    TWO_PAIR = 3E10
-    ONE_PAIR = 2E10
-    HIGH_CARD = 1E10
+    FIVE_OF_KIND = 7
+    FOUR_OF_KIND = 6
+    FULL_HOUSE = 5
+    THREE_OF_KIND = 4
+    TWO_PAIR = 3
+    ONE_PAIR = 2
+    HIGH_CARD = 1
+
+
+# hand key layout: type in the high nibble, followed by one nibble per card rank
+CARD_BITS = 4
+HAND_SIZE = 5
+TYPE_SHIFT = CARD_BITS * HAND_SIZE
+
+CARD_ORDER = [Card.TWO, Card.THREE, Card.FOUR, Card.FIVE, Card.SIX, Card.SEVEN, Card.EIGHT, Card.NINE,
+              Card.T, Card.J, Card.Q, Card.K, Card.A]
+CARD_INDEX = {card: i for i, card in enumerate(CARD_ORDER)}
+
+# columns of the hand type table
+STANDARD_RULES = 0
+JOKER_RULES = 1
+
+# bump when the table layout or classification changes, cached tables of other versions are ignored
+HAND_TYPES_VERSION = 1
+
+
+def hand_types_cache_path() -> str:
+    types = [TypeStrength.HIGH_CARD, TypeStrength.ONE_PAIR, TypeStrength.TWO_PAIR, TypeStrength.THREE_OF_KIND,
+             TypeStrength.FULL_HOUSE, TypeStrength.FOUR_OF_KIND, TypeStrength.FIVE_OF_KIND]
+    fingerprint = f'{HAND_TYPES_VERSION}:{"".join(CARD_ORDER)}:{Card.J}:{types}'
+    digest = hashlib.sha256(fingerprint.encode()).hexdigest()[:16]
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), f'hand_types-{digest}.npy')
+
+
+HAND_TYPES_CACHE = hand_types_cache_path()
 
 
 class Hand:
@@ -36,70 +73,19 @@ class Hand:
         self.cards: list[str] = cards
         self.bid: int = bid
 
-        self.power: float = self.__calculate_power()
+        self.power: int = self.__calculate_power()
 
-    def __count_cards(self) -> dict[str, int]:
-        card_count: dict[str, int] = {}
+    def __identify_type(self) -> int:
+        code = 0
         for card in self.cards:
-            if card in card_count:
-                card_count[card] += 1
-            else:
-                card_count[card] = 1
-        return card_count
-
-    def __identify_type(self) -> float:
-        card_count = self.__count_cards()
-        counts = card_count.values()
-        match len(card_count):
-            case 1:
-                return TypeStrength.FIVE_OF_KIND
-            case 2:
-                if 4 in counts and 1 in counts:
-                    return TypeStrength.FOUR_OF_KIND
-                return TypeStrength.FULL_HOUSE
-            case 3:
-                if 3 in counts:
-                    return TypeStrength.THREE_OF_KIND
-                return TypeStrength.TWO_PAIR
-            case 4:
-                return TypeStrength.ONE_PAIR
-            case 5:
-                return TypeStrength.HIGH_CARD
-
-    def __identify_type_with_jokers(self) -> float:
-        card_count = self.__count_cards()
-        jokers = 0
-        if Card.J in card_count:
-            jokers = card_count.pop(Card.J)
-
-        if not jokers:
-            return self.__identify_type()
-
-        # max value of `len(counts_without_jokers)` is 4 not 5
-        counts_without_jokers = card_count.values()
-        match len(counts_without_jokers):
-            case 0:  # JJJJJ
-                return TypeStrength.FIVE_OF_KIND
-            case 1:  # JKKKK or JJKKK or JJJKK or JJJJK
-                return TypeStrength.FIVE_OF_KIND
-            case 2:  # JKKK2 or JKK22 or JJKK2 or JJJK2
-                if jokers == 1:
-                    if 3 in counts_without_jokers:
-                        return TypeStrength.FOUR_OF_KIND
-                    return TypeStrength.FULL_HOUSE
-                return TypeStrength.FOUR_OF_KIND
-            case 3:  # JKK2T or JJK2T
-                return TypeStrength.THREE_OF_KIND
-            case 4:  # JK2TA
-                return TypeStrength.ONE_PAIR
-
-    def __calculate_power(self) -> float:
-        power = self.__identify_type_with_jokers() if self.joker else self.__identify_type()
+            code = code * len(CARD_ORDER) + CARD_INDEX[card]
+        return int(HAND_TYPES[code, JOKER_RULES if self.joker else STANDARD_RULES])
+
+    def __calculate_power(self) -> int:
+        power = self.__identify_type()
         strengths = Hand.STRENGTH_WITH_JOKER if self.joker else Hand.STRENGTH
-        multiplier = 8
-        for i, card in enumerate(self.cards):
-            tmp = i * 2
-            power += strengths[card] * 10**(multiplier - tmp)
+        for card in self.cards:
+            power = (power << CARD_BITS) | strengths[card]
         return power
 
     def __str__(self) -> str:
@@ -120,6 +106,307 @@ def load_hands_from_file(filepath: str, joker=False) -> list[Hand]:
         return hands
 
 
+def rank_table(strengths: dict[str, int]) -> np.ndarray:
+    table = np.zeros(256, dtype=np.int64)
+    for card, strength in strengths.items():
+        table[ord(card)] = strength
+    return table
+
+
+RANKS = rank_table(Hand.STRENGTH)
+RANKS_WITH_JOKER = rank_table(Hand.STRENGTH_WITH_JOKER)
+
+# sum of squared card counts identifies the type: 5 distinct cards -> 5, one pair -> 4+1+1+1, ...
+TYPES_BY_SQUARES = np.zeros(26, dtype=np.int64)
+TYPES_BY_SQUARES[[5, 7, 9, 11, 13, 17, 25]] = [
+    TypeStrength.HIGH_CARD, TypeStrength.ONE_PAIR, TypeStrength.TWO_PAIR, TypeStrength.THREE_OF_KIND,
+    TypeStrength.FULL_HOUSE, TypeStrength.FOUR_OF_KIND, TypeStrength.FIVE_OF_KIND]
+
+
+def classify_hands(ranks: np.ndarray, jokers: np.ndarray | None = None) -> np.ndarray:
+    # counts[h, i] = how many cards of hand h share the rank of card i
+    counts = (ranks[:, :, np.newaxis] == ranks[:, np.newaxis, :]).sum(axis=2, dtype=np.int64)
+    if jokers is None:
+        return TYPES_BY_SQUARES[counts.sum(axis=1)]
+
+    # jokers always join the most common other card
+    counts[jokers] = 0
+    most_common = counts.max(axis=1)
+    joker_count = jokers.sum(axis=1)
+    squares = counts.sum(axis=1) + (most_common + joker_count) ** 2 - most_common ** 2
+    return TYPES_BY_SQUARES[squares]
+
+
+def build_hand_types() -> np.ndarray:
+    codes = np.arange(len(CARD_ORDER) ** HAND_SIZE)
+    # card indices of every code, most significant card first
+    cards = np.stack([codes // len(CARD_ORDER) ** (HAND_SIZE - 1 - i) % len(CARD_ORDER)
+                      for i in range(HAND_SIZE)], axis=1)
+    table = np.zeros((len(codes), 2), dtype=np.uint8)
+    table[:, STANDARD_RULES] = classify_hands(cards)
+    table[:, JOKER_RULES] = classify_hands(cards, cards == CARD_INDEX[Card.J])
+    return table
+
+
+def is_valid_hand_types(table: np.ndarray) -> bool:
+    if table.dtype != np.uint8 or table.shape != (len(CARD_ORDER) ** HAND_SIZE, 2):
+        return False
+    if table.min() < TypeStrength.HIGH_CARD or table.max() > TypeStrength.FIVE_OF_KIND:
+        return False
+    # spot check a few known hands: 22222, 2345J and AKQJT
+    two, three, four, five, jack = (CARD_INDEX[c] for c in (Card.TWO, Card.THREE, Card.FOUR, Card.FIVE, Card.J))
+    ace, king, queen, ten = (CARD_INDEX[c] for c in (Card.A, Card.K, Card.Q, Card.T))
+    expected = {
+        (two,) * HAND_SIZE: (TypeStrength.FIVE_OF_KIND, TypeStrength.FIVE_OF_KIND),
+        (two, three, four, five, jack): (TypeStrength.HIGH_CARD, TypeStrength.ONE_PAIR),
+        (ace, king, queen, jack, ten): (TypeStrength.HIGH_CARD, TypeStrength.ONE_PAIR),
+    }
+    for cards, types in expected.items():
+        code = 0
+        for card in cards:
+            code = code * len(CARD_ORDER) + card
+        if tuple(table[code].tolist()) != types:
+            return False
+    return True
+
+
+def load_hand_types(cache_path: str = HAND_TYPES_CACHE) -> np.ndarray:
+    try:
+        table = np.load(cache_path)
+        if is_valid_hand_types(table):
+            return table
+    except (OSError, ValueError, EOFError):
+        pass  # missing or unreadable cache, rebuild it below
+
+    table = build_hand_types()
+    try:
+        tmp_path = f'{cache_path}.tmp.npy'
+        np.save(tmp_path, table)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass  # the table is still usable, it just gets rebuilt next time
+    return table
+
+
+HAND_TYPES = load_hand_types()
+
+
+def card_index_table() -> np.ndarray:
+    # bytes that are not cards stay at -1
+    table = np.full(256, -1, dtype=np.int64)
+    for card, index in CARD_INDEX.items():
+        table[ord(card)] = index
+    return table
+
+
+CARD_INDEX_BYTES = card_index_table()
+
+
+def parse_hand_bytes(buffer: bytes) -> tuple[np.ndarray, np.ndarray]:
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    newlines = np.flatnonzero(data == ord('\n'))
+    starts = np.concatenate(([0], newlines + 1))
+    ends = np.concatenate((newlines, [len(data)]))
+    lines = ends - starts > HAND_SIZE
+    starts, ends = starts[lines], ends[lines]
+
+    cards = data[starts[:, np.newaxis] + np.arange(HAND_SIZE)]
+
+    # bids are read column by column after the cards and the separating space
+    widths = ends - starts - (HAND_SIZE + 1)
+    bids = np.zeros(len(starts), dtype=np.int64)
+    for column in range(widths.max(initial=0)):
+        inside = column < widths
+        ch = data[np.where(inside, starts + HAND_SIZE + 1 + column, 0)]
+        digit = inside & (ch >= ord('0')) & (ch <= ord('9'))
+        bids = np.where(digit, bids * 10 + ch.astype(np.int64) - ord('0'), bids)
+    return cards, bids
+
+
+def hand_keys(cards: np.ndarray, joker=False) -> np.ndarray:
+    indices = CARD_INDEX_BYTES[cards]
+    if (invalid := np.flatnonzero((indices < 0).any(axis=1))).size:
+        raise ValueError(f"Invalid card in hand: {bytes(cards[invalid[0]]).decode(errors='replace')}")
+
+    codes = np.zeros(len(cards), dtype=np.int64)
+    for i in range(HAND_SIZE):
+        codes = codes * len(CARD_ORDER) + indices[:, i]
+
+    ranks = (RANKS_WITH_JOKER if joker else RANKS)[cards]
+    keys = HAND_TYPES[codes, JOKER_RULES if joker else STANDARD_RULES].astype(np.int64) << TYPE_SHIFT
+    for i in range(HAND_SIZE):
+        keys |= ranks[:, i] << (CARD_BITS * (HAND_SIZE - 1 - i))
+    return keys
+
+
+def load_hand_arrays(buffer: bytes, joker=False) -> tuple[np.ndarray, np.ndarray]:
+    cards, bids = parse_hand_bytes(buffer)
+    return hand_keys(cards, joker), bids
+
+
+def load_hand_arrays_from_file(filepath: str, joker=False) -> tuple[np.ndarray, np.ndarray]:
+    with open(filepath, mode='rb') as file:
+        return load_hand_arrays(file.read(), joker)
+
+
+def get_total_winning_arrays(keys: np.ndarray, bids: np.ndarray, block_size=1 << 20) -> int:
+    sorted_bids = bids[np.argsort(keys, kind='stable')]
+    winning = 0
+    # partial dot products stay within int64, the running total is a python int
+    for start in range(0, len(sorted_bids), block_size):
+        block = sorted_bids[start:start + block_size]
+        winning += int(np.dot(block, np.arange(start + 1, start + len(block) + 1, dtype=np.int64)))
+    return winning
+
+
+# compact on-disk record of a sorted run
+RUN_RECORD = np.dtype([('key', '<u4'), ('bid', '<i8')])
+
+
+def write_sorted_runs(filepath: str, directory: str, joker=False, max_hands_in_memory=1_000_000) -> list[str]:
+    def write_run(lines: list[bytes]) -> str:
+        keys, bids = load_hand_arrays(b''.join(lines), joker)
+        order = np.argsort(keys, kind='stable')
+        run = np.empty(len(order), dtype=RUN_RECORD)
+        run['key'] = keys[order]
+        run['bid'] = bids[order]
+        path = os.path.join(directory, f'run{len(runs)}.bin')
+        run.tofile(path)
+        return path
+
+    runs: list[str] = []
+    with open(filepath, mode='rb') as file:
+        lines: list[bytes] = []
+        for line in file:
+            lines.append(line if line.endswith(b'\n') else line + b'\n')
+            if len(lines) == max_hands_in_memory:
+                runs.append(write_run(lines))
+                lines = []
+        if lines:
+            runs.append(write_run(lines))
+    return runs
+
+
+def read_run(path: str, block_size: int) -> Iterator[tuple[int, int]]:
+    with open(path, mode='rb') as file:
+        while True:
+            block = np.fromfile(file, dtype=RUN_RECORD, count=block_size)
+            if not len(block):
+                return
+            yield from zip(block['key'].tolist(), block['bid'].tolist())
+
+
+def merge_runs(paths: list[str], path: str, block_size: int) -> None:
+    # heapq.merge prefers earlier runs on equal keys, which keeps the file order like `sorted`
+    merged = heapq.merge(*(read_run(run, block_size) for run in paths), key=lambda record: record[0])
+    with open(path, mode='wb') as file:
+        block: list[tuple[int, int]] = []
+        for record in merged:
+            block.append(record)
+            if len(block) == block_size:
+                np.array(block, dtype=RUN_RECORD).tofile(file)
+                block = []
+        if block:
+            np.array(block, dtype=RUN_RECORD).tofile(file)
+
+
+def get_total_winning_external(filepath: str, joker=False, max_hands_in_memory=1_000_000, block_size=4096,
+                               max_runs_open=64) -> int:
+    if max_runs_open < 2:
+        raise ValueError(f"At least two runs must be open to merge: {max_runs_open}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        runs = write_sorted_runs(filepath, directory, joker, max_hands_in_memory)
+        # merge neighbouring runs in passes until a single pass can read all of them at once
+        merge_pass = 0
+        while len(runs) > max_runs_open:
+            merged_runs = []
+            for start in range(0, len(runs), max_runs_open):
+                path = os.path.join(directory, f'merge{merge_pass}-{len(merged_runs)}.bin')
+                merge_runs(runs[start:start + max_runs_open], path, block_size)
+                for run in runs[start:start + max_runs_open]:
+                    os.remove(run)
+                merged_runs.append(path)
+            runs = merged_runs
+            merge_pass += 1
+
+        merged = heapq.merge(*(read_run(path, block_size) for path in runs), key=lambda record: record[0])
+        winning = 0
+        for rank, (_, bid) in enumerate(merged, start=1):
+            winning += bid * rank
+        return winning
+
+
+def get_total_winnings_both(filepath: str) -> tuple[int, int]:
+    with open(filepath, mode='rb') as file:
+        cards, bids = parse_hand_bytes(file.read())
+    standard = get_total_winning_arrays(hand_keys(cards), bids)
+    with_jokers = get_total_winning_arrays(hand_keys(cards, joker=True), bids)
+    return standard, with_jokers
+
+
+# compressed key space: (type - 1) * 13^5 + base-13 code of the card ranks
+RANK_CODES = len(CARD_ORDER) ** HAND_SIZE
+KEY_SPACE = TypeStrength.FIVE_OF_KIND * RANK_CODES
+
+
+class Leaderboard:
+    def __init__(self, joker=False) -> None:
+        self.joker = joker
+        self.lowest_rank = min((Hand.STRENGTH_WITH_JOKER if joker else Hand.STRENGTH).values())
+
+        # Fenwick trees over compressed hand keys: number of hands and sum of their bids
+        self.counts = [0] * (KEY_SPACE + 1)
+        self.bids = [0] * (KEY_SPACE + 1)
+
+        self.hands = 0
+        self.total_bids = 0
+        self.total_winning = 0
+
+    def compress(self, key: int) -> int:
+        code = 0
+        for i in range(HAND_SIZE - 1, -1, -1):
+            rank = (key >> (CARD_BITS * i)) & ((1 << CARD_BITS) - 1)
+            if not 0 <= rank - self.lowest_rank < len(CARD_ORDER):
+                raise ValueError(f"Card rank {rank} does not belong to this leaderboard's rules")
+            code = code * len(CARD_ORDER) + rank - self.lowest_rank
+        return ((key >> TYPE_SHIFT) - TypeStrength.HIGH_CARD) * RANK_CODES + code
+
+    def __add(self, index: int, bid: int) -> None:
+        index += 1
+        while index < len(self.counts):
+            self.counts[index] += 1
+            self.bids[index] += bid
+            index += index & -index
+
+    def __prefix(self, index: int) -> tuple[int, int]:
+        count = bids = 0
+        index += 1
+        while index > 0:
+            count += self.counts[index]
+            bids += self.bids[index]
+            index -= index & -index
+        return count, bids
+
+    def insert_key(self, key: int, bid: int) -> int:
+        # equal keys rank in insertion order, same as the stable sort in `get_total_winning`
+        index = self.compress(key)
+        count_below, bids_below = self.__prefix(index)
+        rank = count_below + 1
+        # every hand ranked above the new one moves up by one rank
+        self.total_winning += rank * bid + (self.total_bids - bids_below)
+
+        self.__add(index, bid)
+        self.hands += 1
+        self.total_bids += bid
+        return self.total_winning
+
+    def insert(self, hand: Hand) -> int:
+        if hand.joker != self.joker:
+            raise ValueError(f'Hand uses joker={hand.joker} rules, leaderboard uses joker={self.joker}: {hand}')
+        return self.insert_key(hand.power, hand.bid)
+
+
 def get_total_winning(hands: list[Hand], debug_logs=False) -> int:
     winning = 0
     sorted_hands = sorted(hands, key=lambda h: h.power)
@@ -133,11 +420,7 @@ def get_total_winning(hands: list[Hand], debug_logs=False) -> int:
 
 if __name__ == '__main__':
     filepath = 'input.txt'
-    
-    hands = load_hands_from_file(filepath)
-    winning = get_total_winning(hands)
-    print('TOTAL WINNINGS (NO jokers rule):', winning)
 
-    hands_with_jokers = load_hands_from_file(filepath, joker=True)
-    winning_jokers = get_total_winning(hands_with_jokers)
+    winning, winning_jokers = get_total_winnings_both(filepath)
+    print('TOTAL WINNINGS (NO jokers rule):', winning)
     print('TOTAL WINNINGS (WITH jokers rule):', winning_jokers)
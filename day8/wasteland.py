@@ -1,5 +1,10 @@
-from math import lcm
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
+from itertools import repeat
+from math import gcd, lcm
+from typing import Callable
+
+import numpy as np
 
 
 class Node:
@@ -54,64 +59,151 @@ def traverse_nodes(instructions: str, nodes: dict[str, Node]) -> int:
                 return steps
 
 
-class Job:
-    def __init__(self, node: Node, instructions: str) -> None:
-        self.node = node
-        self.instructions = instructions
-        self.current_instruction_index = -1
-        self.steps = 0
-
-    @staticmethod
-    def from_result(result: 'JobResult') -> 'Job':
-        return Job(result.current_node, result.instructions, result.last_instruction_id, result.steps)
+class GraphArrays:
+    def __init__(self, nodes: dict[str, Node], is_target: Callable[[str], bool]) -> None:
+        self.names = list(nodes)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.left = np.array([self.index[nodes[name].left.name] for name in self.names], dtype=np.int64)
+        self.right = np.array([self.index[nodes[name].right.name] for name in self.names], dtype=np.int64)
+        self.targets = np.array([is_target(name) for name in self.names], dtype=bool)
 
-    def to_result(self) -> 'JobResult':
-        return JobResult(self.node, self.steps)
 
-    def __move_step(self) -> None:
-        self.current_instruction_index = (
-            self.current_instruction_index + 1) % len(self.instructions)
-        instruction = self.instructions[self.current_instruction_index]
-        match instruction:
-            case 'L':
-                self.node = self.node.left
-            case 'R':
-                self.node = self.node.right
-        self.steps += 1
-
-    def __ends_with_z(self) -> bool:
-        return self.node.name[-1] == 'Z'
+class CompiledGraph(GraphArrays):
+    def __init__(self, instructions: str, nodes: dict[str, Node], is_target: Callable[[str], bool]) -> None:
+        super().__init__(nodes, is_target)
+        self.instructions = instructions
 
-    def run(self) -> 'JobResult':
-        while True:
-            self.__move_step()
-            if self.__ends_with_z():
-                return self.to_result()
+        # positions[s, v] = node reached from v after s steps of one pass over `instructions`
+        period = len(instructions)
+        self.positions = np.empty((period + 1, len(self.names)), dtype=np.int64)
+        self.positions[0] = np.arange(len(self.names))
+        for step, instruction in enumerate(instructions, start=1):
+            children = self.left if instruction == 'L' else self.right
+            self.positions[step] = children[self.positions[step - 1]]
+
+        # earliest step (1..period) inside one pass at which a target is hit, 0 when there is none
+        hits = self.targets[self.positions[1:]]
+        self.first_hit = np.where(hits.any(axis=0), hits.argmax(axis=0) + 1, 0)
+
+        # binary lifting over whole passes: jumps[k] moves 2^k passes ahead,
+        # hit_within[k] is the earliest target step within those 2^k passes (0 when none)
+        self.jumps = [self.positions[period]]
+        self.hit_within = [self.first_hit]
+        for k in range(1, len(self.names).bit_length()):
+            jump, hit = self.jumps[-1], self.hit_within[-1]
+            later = np.where(hit[jump] > 0, (1 << (k - 1)) * period + hit[jump], 0)
+            self.hit_within.append(np.where(hit > 0, hit, later))
+            self.jumps.append(jump[jump])
+
+    def __extend_jumps(self, levels: int) -> None:
+        while len(self.jumps) < levels:
+            self.jumps.append(self.jumps[-1][self.jumps[-1]])
+
+    def position_after(self, start: str, steps: int) -> str:
+        passes, rest = divmod(steps, len(self.instructions))
+        self.__extend_jumps(passes.bit_length())
+        node = self.index[start]
+        for k in range(passes.bit_length()):
+            if passes >> k & 1:
+                node = self.jumps[k][node]
+        return self.names[self.positions[rest, node]]
+
+    def steps_until_target(self, start: str) -> int | None:
+        node = self.index[start]
+        steps = 0
+        for k in range(len(self.hit_within) - 1, -1, -1):
+            if self.hit_within[k][node] == 0:
+                node = self.jumps[k][node]
+                steps += (1 << k) * len(self.instructions)
+        if self.first_hit[node] == 0:
+            # passes form a functional graph on at most len(names) nodes, missing it now means never
+            return None
+        return steps + int(self.first_hit[node])
 
 
 @dataclass
-class JobResult:
-    current_node: Node
-    steps: int
-
-
-def traverse_nodes_part2(instructions: str, nodes: dict[str, Node]) -> int:
-    def find_lcm(results: list[JobResult]) -> int:
-        numbers = [r.steps for r in results]
-        while len(numbers) > 1:
-            a = numbers.pop()
-            b = numbers.pop()
-            c = lcm(a, b)
-            numbers.append(c)
-        return numbers[0]
-
-    starting_nodes = [n for n in nodes.values() if n.name[-1] == 'A']
-    jobs = (Job(n, instructions) for n in starting_nodes)
-    results = []
-
-    for job in jobs:
-        results.append(job.run())
-    return find_lcm(results)
+class GhostCycle:
+    # steps before the (node, instruction index) states start repeating, and the repeat length
+    prefix: int
+    cycle: int
+    # steps hitting a target before the cycle, and within the first pass of the cycle
+    prefix_hits: set[int]
+    cycle_hits: set[int]
+
+    def hits(self, step: int) -> bool:
+        if step < self.prefix:
+            return step in self.prefix_hits
+        return self.prefix + (step - self.prefix) % self.cycle in self.cycle_hits
+
+
+def analyse_ghost(instructions: str, left: np.ndarray, right: np.ndarray, targets: np.ndarray, start: int) -> GhostCycle:
+    left, right, targets = left.tolist(), right.tolist(), targets.tolist()
+    period = len(instructions)
+    seen: dict[tuple[int, int], int] = {}
+    hits: list[int] = []
+    node = start
+    step = 0
+    while (node, step % period) not in seen:
+        seen[(node, step % period)] = step
+        node = left[node] if instructions[step % period] == 'L' else right[node]
+        step += 1
+        if targets[node]:
+            hits.append(step)
+
+    prefix = seen[(node, step % period)]
+    # the last move re-entered the cycle, a hit on it is the cycle's first step seen again
+    hits = [h for h in hits if h < step]
+    if prefix == 0 and targets[node]:
+        hits.insert(0, 0)
+    return GhostCycle(prefix, step - prefix, {h for h in hits if h < prefix}, {h for h in hits if h >= prefix})
+
+
+def combine_congruences(first: tuple[int, int], second: tuple[int, int]) -> tuple[int, int] | None:
+    residue1, modulus1 = first
+    residue2, modulus2 = second
+    divisor = gcd(modulus1, modulus2)
+    if (residue2 - residue1) % divisor:
+        return None
+    modulus = lcm(modulus1, modulus2)
+    k = (residue2 - residue1) // divisor * pow(modulus1 // divisor, -1, modulus2 // divisor) % (modulus2 // divisor)
+    return (residue1 + k * modulus1) % modulus, modulus
+
+
+def find_first_common_step(ghosts: list[GhostCycle]) -> int | None:
+    # before every ghost is on its cycle, only explicit hits of the slowest ghost can work
+    latest = max(ghosts, key=lambda g: g.prefix)
+    for step in sorted(latest.prefix_hits):
+        if step >= 1 and all(g.hits(step) for g in ghosts):
+            return step
+
+    # afterwards each ghost needs step = cycle hit (mod its cycle length)
+    congruences = {(0, 1)}
+    for ghost in ghosts:
+        combined = set()
+        for congruence in congruences:
+            for hit in ghost.cycle_hits:
+                if result := combine_congruences(congruence, (hit % ghost.cycle, ghost.cycle)):
+                    combined.add(result)
+        congruences = combined
+
+    best = None
+    lowest = max(latest.prefix, 1)
+    for residue, modulus in congruences:
+        step = residue + max(0, -(-(lowest - residue) // modulus)) * modulus
+        if best is None or step < best:
+            best = step
+    return best
+
+
+def traverse_nodes_part2(instructions: str, nodes: dict[str, Node]) -> int | None:
+    # the ghosts only walk the node arrays, the per-pass jump tables are not needed here
+    graph = GraphArrays(nodes, lambda name: name[-1] == 'Z')
+    starts = [graph.index[name] for name in graph.names if name[-1] == 'A']
+
+    with ProcessPoolExecutor() as pool:
+        ghosts = list(pool.map(analyse_ghost, repeat(instructions), repeat(graph.left),
+                               repeat(graph.right), repeat(graph.targets), starts))
+    return find_first_common_step(ghosts)
 
 
 def part1():
@@ -120,6 +212,9 @@ def part1():
 
     print('PART1 - STEPS:', steps)
 
+    graph = CompiledGraph(instructions, nodes, lambda name: name == 'ZZZ')
+    print('PART1 - STEPS (compiled):', graph.steps_until_target('AAA'))
+
 
 def part2():
     instructions, nodes = load_instructions_and_nodes('input.txt')